@@ -1,10 +1,15 @@
 #!/usr/bin/env python3
 import os
 import sys
+import re
 import ast
 import platform
+import functools
 import subprocess
+from concurrent.futures import ProcessPoolExecutor
+from dataclasses import dataclass
 from datetime import datetime
+from typing import Optional, Tuple
 
 # Attempt to import pathspec for parsing .gitignore patterns.
 try:
@@ -12,6 +17,20 @@ try:
 except ImportError:
     pathspec = None
 
+# File and directory names that are always skipped, wherever they appear in the tree.
+IGNORE_BASENAMES = frozenset({
+    '.git', '.gitignore', '.gitmodules', 'venv', '.venv', 'env', 'site-packages', '__pycache__'
+})
+
+@functools.lru_cache(maxsize=1024)
+def _has_git(directory):
+    """
+    Returns whether directory contains a .git folder. Cached, including negative results,
+    so ancestors shared between lookups are only probed once.
+    """
+    return os.path.isdir(os.path.join(directory, ".git"))
+
+@functools.lru_cache(maxsize=None)
 def find_git_root(starting_directory):
     """
     Recurses upward from starting_directory until a .git folder is found.
@@ -19,25 +38,25 @@ def find_git_root(starting_directory):
     """
     current_dir = os.path.abspath(starting_directory)
     while True:
-        if os.path.isdir(os.path.join(current_dir, ".git")):
+        if _has_git(current_dir):
             return current_dir
         parent_dir = os.path.dirname(current_dir)
         if parent_dir == current_dir:
             return None
         current_dir = parent_dir
 
+@functools.lru_cache(maxsize=None)
 def get_git_info(project_root):
     """
     Returns the current git commit hash and commit date for the repository at project_root.
+    Both come from a single git invocation and are cached per project_root.
     If git commands fail, returns (None, None).
     """
     try:
-        commit_hash = subprocess.check_output(
-            ["git", "rev-parse", "HEAD"], cwd=project_root
-        ).decode().strip()
-        commit_date = subprocess.check_output(
-            ["git", "log", "-1", "--format=%cd"], cwd=project_root
+        output = subprocess.check_output(
+            ["git", "log", "-1", "--format=%H%n%cd"], cwd=project_root
         ).decode().strip()
+        commit_hash, commit_date = output.split("\n", 1)
         return commit_hash, commit_date
     except Exception:
         return None, None
@@ -59,123 +78,239 @@ def load_gitignore_spec(project_root):
             return None
     return None
 
-def should_ignore(path, project_root, spec):
+# Named groups cannot repeat inside one regex, so they are made anonymous before combining.
+_NAMED_GROUP_RE = re.compile(r'\(\?P<\w+>')
+
+def compile_gitignore_matcher(spec):
+    """
+    Specializes a pathspec spec into a single function taking a relative path and returning
+    whether it is ignored. All include patterns are merged into one alternation regex, so a path
+    that matches none of them is rejected with a single search. Only when the .gitignore has
+    negated ("!") patterns does a hit fall through to spec.match_file for pattern ordering.
+    Returns None if there is no spec.
+    """
+    if not spec:
+        return None
+    include = []
+    has_negation = False
+    for pattern in spec.patterns:
+        regex = getattr(pattern, 'regex', None)
+        if pattern.include is None or regex is None:
+            continue
+        if not isinstance(regex.pattern, str) or regex.flags & ~re.UNICODE:
+            return spec.match_file
+        if pattern.include:
+            include.append(_NAMED_GROUP_RE.sub('(?:', regex.pattern))
+        else:
+            has_negation = True
+    if not include:
+        return lambda rel: False
+    try:
+        combined = re.compile('|'.join(f'(?:{p})' for p in include))
+    except re.error:
+        return spec.match_file
+
+    def match(rel):
+        if os.sep != '/':
+            rel = rel.replace(os.sep, '/')
+        if not combined.search(rel):
+            return False
+        return spec.match_file(rel) if has_negation else True
+
+    return match
+
+def should_ignore(path, root_prefix, ignore_match):
     """
     Determines whether the given file or directory path should be ignored.
+    path must already be absolute and normalized. root_prefix is the absolute project root
+    followed by a path separator; paths below it are checked relative to the project root.
     Ignores:
       - Anything in a __pycache__ folder.
       - Any file or directory whose name exactly matches .git, .gitignore, or .gitmodules.
       - Any file or directory inside common virtual environment or pip package folders (e.g. venv, .venv, env, site-packages).
-      - Files matching patterns in the .gitignore spec (if provided).
+      - Files matched by ignore_match, the compiled .gitignore matcher (if provided).
     """
-    norm_path = os.path.normpath(path)
-    parts = norm_path.split(os.sep)
-    if '__pycache__' in parts:
+    rel = path[len(root_prefix):] if path.startswith(root_prefix) else path
+    if not IGNORE_BASENAMES.isdisjoint(rel.split(os.sep)):
+        return True
+    if ignore_match and ignore_match(rel):
         return True
-    ignore_set = {'.git', '.gitignore', '.gitmodules', 'venv', '.venv', 'env', 'site-packages'}
-    for part in parts:
-        if part in ignore_set:
-            return True
-    if spec:
-        try:
-            rel = os.path.relpath(path, project_root)
-        except ValueError:
-            rel = path
-        if spec.match_file(rel):
-            return True
     return False
 
+@functools.lru_cache(maxsize=4096)
+def _dir_entries(directory):
+    """
+    Lists directory once with os.scandir and returns a dict mapping each entry name to
+    whether it is a regular file. Missing or unreadable directories yield an empty dict.
+    """
+    try:
+        with os.scandir(directory) as it:
+            return {entry.name: entry.is_file() for entry in it}
+    except OSError:
+        return {}
+
+def _find_module_file(module_dir, name):
+    """
+    Looks for name.py in module_dir, then name/__init__.py, using the cached directory listings.
+    module_dir must be absolute, so the returned file path is too. Returns None if not found.
+    """
+    if _dir_entries(module_dir).get(name + ".py"):
+        return os.path.join(module_dir, name + ".py")
+    package_dir = os.path.join(module_dir, name)
+    if _dir_entries(package_dir).get("__init__.py"):
+        return os.path.join(package_dir, "__init__.py")
+    return None
+
+@functools.lru_cache(maxsize=8192)
 def resolve_module(module_name, base_dir):
     """
     Given a module name (e.g. 'foo.bar'), attempt to resolve it to a file path relative to base_dir.
-    Returns the file path if found, else None.
+    base_dir must be absolute. Returns the absolute file path if found, else None.
     """
     parts = module_name.split('.')
-    file_path = os.path.join(base_dir, *parts) + ".py"
-    if os.path.isfile(file_path):
-        return os.path.abspath(file_path)
-    package_path = os.path.join(base_dir, *parts, "__init__.py")
-    if os.path.isfile(package_path):
-        return os.path.abspath(package_path)
-    return None
+    return _find_module_file(os.path.join(base_dir, *parts[:-1]), parts[-1])
+
+@dataclass(frozen=True)
+class ImportSpec:
+    """
+    The parts of an import statement needed to resolve it: the module name (None for
+    "from . import x"), the relative import level (0 for absolute imports), and the imported names.
+    """
+    module: Optional[str]
+    level: int
+    names: Tuple[str, ...] = ()
 
-def resolve_import(node, current_file, project_root):
+def resolve_import(imp, current_file, project_root):
     """
-    Given an import node (ast.Import or ast.ImportFrom), resolve it to file paths (if possible)
+    Given an ImportSpec, resolve it to file paths (if possible)
     relative to the current file's directory first, then falling back to project_root.
+    current_file and project_root must both be absolute.
     """
     results = []
-    if isinstance(node, ast.Import):
-        for alias in node.names:
-            module_name = alias.name
+    current_dir = os.path.dirname(current_file)
+    if imp.level == 0:
+        if imp.module:
             # Try resolving relative to the current file's directory first.
-            current_dir = os.path.dirname(os.path.abspath(current_file))
-            resolved = resolve_module(module_name, current_dir)
+            resolved = resolve_module(imp.module, current_dir)
             if not resolved:
-                resolved = resolve_module(module_name, project_root)
+                resolved = resolve_module(imp.module, project_root)
             if resolved:
                 results.append(resolved)
-    elif isinstance(node, ast.ImportFrom):
-        if node.level == 0:
-            if node.module:
-                current_dir = os.path.dirname(os.path.abspath(current_file))
-                resolved = resolve_module(node.module, current_dir)
-                if not resolved:
-                    resolved = resolve_module(node.module, project_root)
-                if resolved:
-                    results.append(resolved)
+    else:
+        # Relative import.
+        for _ in range(imp.level - 1):
+            current_dir = os.path.dirname(current_dir)
+        if imp.module:
+            resolved = resolve_module(imp.module, current_dir)
         else:
-            # Relative import.
-            current_dir = os.path.dirname(os.path.abspath(current_file))
-            for _ in range(node.level - 1):
-                current_dir = os.path.dirname(current_dir)
-            if node.module:
-                candidate_dir = os.path.join(current_dir, *node.module.split('.'))
-            else:
-                candidate_dir = current_dir
-            file_candidate = candidate_dir + ".py"
-            if os.path.isfile(file_candidate):
-                results.append(os.path.abspath(file_candidate))
-            else:
-                init_candidate = os.path.join(candidate_dir, "__init__.py")
-                if os.path.isfile(init_candidate):
-                    results.append(os.path.abspath(init_candidate))
+            # "from . import x" refers to the package itself.
+            resolved = _find_module_file(os.path.dirname(current_dir), os.path.basename(current_dir))
+        if resolved:
+            results.append(resolved)
     return results
 
-def collect_files(file_path, project_root, spec, collected=None):
+def _is_python_source(abs_path):
+    """
+    Cheap check made before a file is handed to a parser: .py files are accepted on their
+    name alone, anything else only if it starts with a shebang line (e.g. an extensionless script).
+    """
+    if abs_path.endswith(".py"):
+        return True
+    try:
+        with open(abs_path, "rb") as f:
+            return f.read(2) == b"#!"
+    except OSError:
+        return False
+
+def _parse_source(content, abs_path):
+    """
+    Parses source text. Empty files have no imports, so they are not parsed.
+    Type comments are never needed for import discovery and are left unparsed.
+    """
+    if not content:
+        return ast.Module(body=[], type_ignores=[])
+    return ast.parse(content, filename=abs_path, type_comments=False)
+
+def _module_level_statements(tree):
+    """
+    Yields the statements that run at import time: the module body plus the bodies of any
+    if/try/with blocks in it. Function and class bodies are skipped.
+    """
+    stack = list(reversed(tree.body))
+    while stack:
+        node = stack.pop()
+        yield node
+        if isinstance(node, (ast.If, ast.Try, getattr(ast, "TryStar", ast.Try), ast.With)):
+            blocks = [node.body]
+            blocks.extend(handler.body for handler in getattr(node, "handlers", []))
+            blocks.extend([getattr(node, "orelse", []), getattr(node, "finalbody", [])])
+            for block in reversed(blocks):
+                stack.extend(reversed(block))
+
+def _parse_and_extract(abs_path):
+    """
+    Reads and parses a single file and extracts its import statements. Runs in a worker process,
+    so only plain data is returned: (abs_path, readable, imports, error). readable is False if
+    the file could not be read as UTF-8, imports is None if it could not be parsed, and error
+    holds the message to report in either case. The content itself is not sent back.
     """
-    Recursively collects files starting from file_path by following import statements.
-    Only files within the project_root that are not ignored are collected.
-    The collected dictionary maps absolute file paths to their content.
-    """
-    if collected is None:
-        collected = {}
-    abs_path = os.path.abspath(file_path)
-    if abs_path in collected:
-        return collected
-    if should_ignore(abs_path, project_root, spec):
-        return collected
     try:
         with open(abs_path, "r", encoding="utf-8") as f:
             content = f.read()
     except Exception as e:
-        print(f"Error reading {abs_path}: {e}")
-        return collected
-    collected[abs_path] = content
+        return abs_path, False, None, f"Error reading {abs_path}: {e}"
     try:
-        tree = ast.parse(content, filename=abs_path)
+        tree = _parse_source(content, abs_path)
     except Exception as e:
-        print(f"Error parsing {abs_path}: {e}")
-        return collected
-    for node in ast.walk(tree):
-        if isinstance(node, (ast.Import, ast.ImportFrom)):
-            file_paths = resolve_import(node, abs_path, project_root)
-            for fp in file_paths:
-                if os.path.commonpath([fp, project_root]) == project_root:
-                    collect_files(fp, project_root, spec, collected)
+        return abs_path, True, None, f"Error parsing {abs_path}: {e}"
+    imports = []
+    for node in _module_level_statements(tree):
+        if isinstance(node, ast.Import):
+            imports.extend(ImportSpec(alias.name, 0) for alias in node.names)
+        elif isinstance(node, ast.ImportFrom):
+            imports.append(ImportSpec(node.module, node.level, tuple(alias.name for alias in node.names)))
+    return abs_path, True, imports, None
+
+def collect_files(file_path, project_root, root_prefix, ignore_match):
+    """
+    Collects files starting from file_path by following import statements, one breadth-first
+    frontier at a time. Files in a frontier are parsed in worker processes; import resolution
+    happens in the calling process, which is the only one touching the collected list.
+    Only files within the project_root that are not ignored are collected.
+    Returns the collected absolute file paths in discovery order; their content is read again
+    when the output is written. project_root must be absolute; file_path is made absolute here,
+    and every path derived from it stays absolute, so no further abspath calls are needed.
+    """
+    collected = []
+    seen = set()
+    frontier = [os.path.abspath(file_path)]
+    with ProcessPoolExecutor(max_workers=os.cpu_count()) as executor:
+        while frontier:
+            batch = []
+            for abs_path in frontier:
+                if abs_path in seen:
+                    continue
+                seen.add(abs_path)
+                if should_ignore(abs_path, root_prefix, ignore_match):
+                    continue
+                if not _is_python_source(abs_path):
+                    print(f"Skipping {abs_path}: not a Python source file")
+                    continue
+                batch.append(abs_path)
+            frontier = []
+            for abs_path, readable, imports, error in executor.map(_parse_and_extract, batch, chunksize=8):
+                if error:
+                    print(error)
+                if not readable:
+                    continue
+                collected.append(abs_path)
+                for imp in imports or ():
+                    for fp in resolve_import(imp, abs_path, project_root):
+                        if fp not in seen and (fp == project_root or fp.startswith(root_prefix)):
+                            frontier.append(fp)
     return collected
 
-def generate_context(project_root, collected, spec):
+def generate_context(project_root, collected, ignore_match):
     """
     Generates a string containing additional context about the project.
     This includes a helpful prompt for ChatGPT, the project root, Python version, git commit info (if available),
@@ -216,14 +351,26 @@ def generate_context(project_root, collected, spec):
     context_lines.append(f"Total Collected Files: {len(collected)}")
     context_lines.append("")
     context_lines.append("List of Collected Files:")
-    for file in sorted(collected.keys()):
+    for file in sorted(collected):
         context_lines.append(f"- {file}")
     context_lines.append("")
     context_lines.append("Filtered Project Directory Structure:")
+
+    def _filter(names, rel_prefix, suffix=''):
+        # Cheap basename check first; only the survivors go through the .gitignore matcher.
+        kept = [n for n in names if n not in IGNORE_BASENAMES]
+        if ignore_match:
+            kept = [n for n in kept if not ignore_match(rel_prefix + n + suffix)]
+        return kept
+
     for root, dirs, files in os.walk(project_root):
-        dirs[:] = [d for d in dirs if not should_ignore(os.path.join(root, d), project_root, spec)]
-        files = [f for f in files if not should_ignore(os.path.join(root, f), project_root, spec)]
-        level = os.path.relpath(root, project_root).count(os.sep)
+        rel = os.path.relpath(root, project_root)
+        rel_prefix = '' if rel == os.curdir else rel.replace(os.sep, '/') + '/'
+        # Pruning dirs in place stops os.walk from descending, so everything below an
+        # ignored directory inherits its verdict without being looked at again.
+        dirs[:] = _filter(dirs, rel_prefix, '/')
+        files = _filter(files, rel_prefix)
+        level = rel.count(os.sep)
         indent = ' ' * 4 * level
         context_lines.append(f"{indent}{os.path.basename(root)}/")
         subindent = ' ' * 4 * (level + 1)
@@ -232,6 +379,25 @@ def generate_context(project_root, collected, spec):
     context_lines.append("\n")
     return "\n".join(context_lines)
 
+def write_output(output_file, context, collected):
+    """
+    Writes the context block followed by every collected file to output_file.
+    Files are streamed from disk one at a time in 1 MiB chunks, so memory use is bounded by
+    the copy buffer rather than by the total size of the collected sources. Sources are read
+    as UTF-8 text, so line endings are normalized to newlines as before.
+    """
+    with open(output_file, "wb", buffering=1 << 20) as out:
+        out.write((context + "\n\n").encode("utf-8"))
+        for file in collected:
+            out.write(f"{'=' * 80}\nFile: {file}\n{'=' * 80}\n\n".encode("utf-8"))
+            try:
+                with open(file, "r", encoding="utf-8") as src:
+                    for chunk in iter(lambda: src.read(1 << 20), ""):
+                        out.write(chunk.encode("utf-8"))
+            except (OSError, UnicodeDecodeError) as e:
+                print(f"Error reading {file}: {e}")
+            out.write(b"\n\n")
+
 def main():
     if len(sys.argv) != 2:
         print("Usage: python collect_project.py <path/to/main.py>")
@@ -245,24 +411,19 @@ def main():
     git_root = find_git_root(starting_dir)
     project_root = git_root if git_root else starting_dir
     project_name = os.path.basename(project_root)
+    root_prefix = project_root.rstrip(os.sep) + os.sep
     
     # Load .gitignore spec if available.
     spec = load_gitignore_spec(project_root)
     if not spec and pathspec is None:
         print("pathspec module not found. Install it via 'pip install pathspec' to honor .gitignore patterns.")
 
-    collected = collect_files(starting_file, project_root, spec)
+    ignore_match = compile_gitignore_matcher(spec)
+
+    collected = collect_files(starting_file, project_root, root_prefix, ignore_match)
     output_file = f"{project_name}_collected_code.txt"
-    with open(output_file, "w", encoding="utf-8") as out:
-        context = generate_context(project_root, collected, spec)
-        out.write(context)
-        out.write("\n\n")
-        for file, content in collected.items():
-            out.write("=" * 80 + "\n")
-            out.write(f"File: {file}\n")
-            out.write("=" * 80 + "\n\n")
-            out.write(content)
-            out.write("\n\n")
+    context = generate_context(project_root, collected, ignore_match)
+    write_output(output_file, context, collected)
     print(f"Collected {len(collected)} file(s) into {output_file}")
 
 if __name__ == "__main__":